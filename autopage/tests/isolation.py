@@ -12,11 +12,10 @@
 
 import contextlib
 import fcntl
-import itertools
-import multiprocessing
 import os
 import pty
 import re
+import select
 import signal
 import struct
 import sys
@@ -33,6 +32,39 @@ import typing
 (LINES, COLUMNS) = (24, 80)
 
 
+def _wait_child(pid: int, timeout: float) -> Optional[int]:
+    """
+    Wait at most timeout seconds for a child process to exit.
+
+    Return the wait status of the process, or None if it is still running.
+    """
+    pidfd_open = getattr(os, 'pidfd_open', None)  # Linux, Python 3.9+
+    if pidfd_open is not None:
+        try:
+            pidfd = pidfd_open(pid)
+        except OSError:
+            pass
+        else:
+            # The pidfd becomes readable when the process exits. Use poll()
+            # because select() cannot handle fds above FD_SETSIZE.
+            try:
+                poller = select.poll()
+                poller.register(pidfd, select.POLLIN)
+                poller.poll(timeout * 1000)
+            finally:
+                os.close(pidfd)
+            timeout = 0
+
+    deadline = time.monotonic() + timeout
+    while True:
+        wait_pid, status = os.waitpid(pid, os.WNOHANG)
+        if wait_pid:
+            return status
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.001)
+
+
 def _open_fifo(path: Optional[str],
                write: bool) -> Optional[int]:
     if path is None:
@@ -55,6 +87,8 @@ class IsolationEnvironment:
         self._stderr_fifo_fd = _open_fifo(stderr_fifo, False)
 
         self._exit_code: Optional[int] = None
+        self._written = False
+        self._interrupted = False
 
         self._raw_lines: typing.List[str] = []
         self._lines: typing.List[str] = []
@@ -63,6 +97,14 @@ class IsolationEnvironment:
         self.write(b'\x03')
 
     def write(self, data: bytes) -> None:
+        interrupt = data.startswith(b'\x03')
+        if self._written and interrupt != self._interrupted:
+            # The pager may discard input that arrives while it is still
+            # handling an interrupt, and an interrupt aborts any command it
+            # is still processing, so give it time to finish first.
+            time.sleep(0.01)
+        self._written = True
+        self._interrupted = data.endswith(b'\x03')
         os.write(self._ptm_fd, data)
         time.sleep(0.001)
 
@@ -74,9 +116,17 @@ class IsolationEnvironment:
     def error_output(self) -> str:
         if self._stderr_fifo_fd is None:
             return ''
-        with os.fdopen(self._stderr_fifo_fd) as errf:
-            self._stderr_fifo_fd = None
-            return errf.read()
+        errf, self._stderr_fifo_fd = self._stderr_fifo_fd, None
+        chunks = []
+        try:
+            while True:
+                chunk = os.read(errf, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(errf)
+        return b''.join(chunks).decode()
 
     def stdout_pipe(self) -> typing.TextIO:
         assert self._stdout_fifo_fd is not None
@@ -89,11 +139,7 @@ class IsolationEnvironment:
         return os.fdopen(self._stdin_fifo_fd, 'w', closefd=False)
 
     def close(self, get_return_code: typing.Callable[[], int]) -> None:
-        for i in range(100):
-            if os.waitpid(self._pid, os.WNOHANG) != (0, 0):
-                break
-            time.sleep(0.001)
-        else:
+        if _wait_child(self._pid, 0.1) is None:
             os.kill(self._pid, signal.SIGTERM)
             os.waitpid(self._pid, 0)
         self._exit_code = get_return_code()
@@ -119,7 +165,7 @@ class IsolationEnvironment:
 class PagerControl:
     _page_end = None
     _ctrl_chars = re.compile(r'\x1b\['
-                             r'(\?|[0-2]?K|[0-9]*;?[0-9]*H|[0-3]?J|[0-9]*m)')
+                             r'(?:\?|[0-2]?K|[0-9]*;?[0-9]*H|[0-3]?J|[0-9]*m)')
 
     def __init__(self, isolation_env: IsolationEnvironment):
         self.env = isolation_env
@@ -128,6 +174,11 @@ class PagerControl:
 
     def _iter_lines(self) -> Generator[typing.Union[str, None],
                                        None, None]:
+        readline = self.env.readline
+        record_output = self.env.record_output
+        strip_ctrl_chars = self._ctrl_chars.sub
+        page_end = self._page_end
+
         def get_content(segment: str) -> Tuple[bool,
                                                typing.Union[str, None]]:
             if not segment:
@@ -136,21 +187,25 @@ class PagerControl:
                 # Ignore lines that are filling blank vertical space with
                 # '~' after hitting Ctrl-C when the screen is not full
                 return False, ''
-            visible = self._ctrl_chars.sub('', segment)
+            if '\x1b' in segment:
+                visible = strip_ctrl_chars('', segment)
+            else:
+                # No escape sequences, so no need to run the regex
+                visible = segment
             if ((visible.rstrip() == ':' or '(END)' in visible
                     or 'Waiting for data...' in visible)
                     and segment.replace('\x1b[m', '') != visible):
-                return True, self._page_end
+                return True, page_end
             elif visible.rstrip() or segment == visible:
                 self._total_lines += 1
-                self.env.record_output(visible)
+                record_output(visible)
                 return True, visible
             return False, ''
 
         while True:
             line = '\x1b[?'
             while line.lstrip(' q').startswith('\x1b[?'):
-                rawline = self.env.readline()
+                rawline = readline()
                 line = (rawline.replace('\x07', '')     # Ignore bell
                                .replace('\x1b[m', ''))  # Ignore style reset
             before, reset, after = line.partition('\x1b[2J')
@@ -158,15 +213,23 @@ class PagerControl:
             valid, content = get_content(before)
             if valid:
                 yield content
-            if reset and not (valid and (content is self._page_end)):
-                yield self._page_end
+            if reset and not (valid and (content is page_end)):
+                yield page_end
             valid, content = get_content(after)
             if valid:
                 yield content
 
     def read_lines(self, count: int) -> typing.Iterator[str]:
-        return itertools.islice((line for line in self._lines
-                                 if line is not self._page_end), count)
+        if count <= 0:
+            return
+        page_end = self._page_end
+        for line in self._lines:
+            if line is page_end:
+                continue
+            yield line
+            count -= 1
+            if not count:
+                return
 
     def _lines_in_page(self) -> int:
         original_count = self._total_lines
@@ -236,31 +299,43 @@ def isolate(child_function: typing.Callable[[], int],
                 'stdout' if stdout_pipe else None,
                 'stderr' if stderr_pipe else None) as fifo_paths:
         result_r, result_w = os.pipe()
+        ready_r, ready_w = os.pipe()
         env_pid, tty = pty.fork()
         if env_pid == pty.CHILD:
             try:
                 os.close(result_r)
+                os.close(ready_r)
                 # Get ttyname from original stdout, even if test runner has
                 # replaced stdout with another file
                 pts = os.ttyname(pty.STDOUT_FILENO)
 
-                ctx = multiprocessing.get_context('spawn')
-                p = ctx.Process(target=_run_test, args=(child_function, pts,
-                                                        *fifo_paths))
-                p.start()
+                test_pid = os.fork()
+                if test_pid == 0:
+                    os.close(result_w)
+                    _run_test_process(child_function, pts, ready_w,
+                                      *fifo_paths)
+                os.close(ready_w)
+
+                test_reaped = False
 
                 def handle_terminate(signum: int,
                                      frame: Optional[types.FrameType]) -> None:
-                    if p.is_alive():
-                        p.terminate()
+                    if not test_reaped:
+                        try:
+                            os.kill(test_pid, signal.SIGTERM)
+                        except ProcessLookupError:
+                            # Reaped, but we have not yet recorded it
+                            pass
 
                 signal.signal(signal.SIGTERM, handle_terminate)
                 # Signals from the pty are for the test process, not us
                 signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-                p.join(2)  # Wait at most 2s
-                if p.exitcode is None:
-                    raise TimeoutException(p.pid)
+                status = _wait_child(test_pid, 2)  # Wait at most 2s
+                if status is None:
+                    raise TimeoutException(test_pid)
+                test_reaped = True
+                test_exitcode = _exit_code_from_status(status)
             except BaseException:
                 try:
                     with os.fdopen(result_w, 'w') as result_writer:
@@ -272,19 +347,25 @@ def isolate(child_function: typing.Callable[[], int],
                         _open_fifo(path, write)
                     os._exit(1)
             with os.fdopen(result_w, 'w') as result_writer:
-                result_writer.write(f'{p.exitcode}\n')
+                result_writer.write(f'{test_exitcode}\n')
 
             os._exit(0)
         else:
             os.close(result_w)
+            os.close(ready_w)
             fcntl.ioctl(tty, termios.TIOCSWINSZ,
                         struct.pack('HHHH', lines, columns, 0, 0))
             env = IsolationEnvironment(env_pid, tty, *fifo_paths)
-            time.sleep(0.01)
             try:
                 try:
+                    # Wait until the test process has set up its terminal. If
+                    # it fails before then, the pipe is closed and this
+                    # returns.
+                    os.read(ready_r, 1)
                     yield env
                 finally:
+                    os.close(ready_r)
+
                     def get_return_code() -> int:
                         with os.fdopen(result_r) as result_reader:
                             result = result_reader.readline().rstrip()
@@ -307,8 +388,50 @@ def isolate(child_function: typing.Callable[[], int],
                 raise
 
 
+def _exit_code_from_status(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _run_test_process(test_function: typing.Callable[[], int],
+                      pts: str,
+                      ready_fd: int,
+                      stdin_fifo: Optional[str],
+                      stdout_fifo: Optional[str],
+                      stderr_fifo: Optional[str]) -> typing.NoReturn:
+    exit_code = 1
+    try:
+        # The test runner may have replaced the standard streams in the
+        # process we were forked from, so reopen them on the pty. As with the
+        # interpreter's own streams, closing them must not close the fds.
+        sys.stdin = open(pty.STDIN_FILENO, closefd=False)
+        sys.stdout = open(pty.STDOUT_FILENO, 'w', closefd=False)
+        sys.stderr = open(pty.STDERR_FILENO, 'w', buffering=1, closefd=False)
+        _run_test(test_function, pts, ready_fd,
+                  stdin_fifo, stdout_fifo, stderr_fifo)
+    except SystemExit as exit:
+        if exit.code is None:
+            exit_code = 0
+        elif isinstance(exit.code, int):
+            exit_code = exit.code
+        else:
+            # Match the interpreter, which prints any other exit value
+            print(exit.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        os._exit(exit_code)
+
+
 def _run_test(test_function: typing.Callable[[], int],
               pts: str,
+              ready_fd: int,
               stdin_fifo: Optional[str],
               stdout_fifo: Optional[str],
               stderr_fifo: Optional[str]) -> typing.NoReturn:
@@ -333,5 +456,8 @@ def _run_test(test_function: typing.Callable[[], int],
         os.dup2(tty_fd, pty.STDERR_FILENO)
     os.close(tty_fd)
 
+    os.write(ready_fd, b'\x01')
+    os.close(ready_fd)
+
     result = test_function()
     sys.exit(result or 0)
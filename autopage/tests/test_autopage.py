@@ -10,6 +10,7 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 
+import contextlib
 import subprocess
 import sys
 import unittest
@@ -17,7 +18,7 @@ from unittest import mock
 
 import fixtures  # type: ignore
 
-from typing import Optional, List, Dict
+from typing import Any, Optional, Iterator, List, Dict, TextIO, Tuple
 
 from autopage.tests import sinks
 
@@ -38,6 +39,19 @@ class PagedStreamTest(fixtures.TestWithFixtures):
         self.useFixture(popen)
         self.popen = popen.mock
 
+    def _assert_default_pager(self, stream: TextIO,
+                              cmd: Any, env: Any) -> None:
+        self.popen.assert_called_once_with(
+            cmd,
+            env=env,
+            bufsize=-1,
+            universal_newlines=True,
+            encoding='UTF-8',
+            errors='strict',
+            stdin=subprocess.PIPE,
+            stdout=None)
+        self.assertIs(stream, self.popen.return_value.stdin)
+
     def test_defaults(self) -> None:
         class TestCommand(command.PagerCommand):
             def command(self) -> List[str]:
@@ -53,16 +67,8 @@ class PagedStreamTest(fixtures.TestWithFixtures):
         with mock.patch.object(ap, '_pager_env') as get_env, \
                 mock.patch.object(tc, 'command') as cmd:
             stream = ap._paged_stream()
-            self.popen.assert_called_once_with(
-                cmd.return_value,
-                env=get_env.return_value,
-                bufsize=-1,
-                universal_newlines=True,
-                encoding='UTF-8',
-                errors='strict',
-                stdin=subprocess.PIPE,
-                stdout=None)
-            self.assertIs(stream, self.popen.return_value.stdin)
+            self._assert_default_pager(stream,
+                                       cmd.return_value, get_env.return_value)
 
     def test_defaults_cmd_as_class(self) -> None:
         class TestCommand(command.PagerCommand):
@@ -79,32 +85,17 @@ class PagedStreamTest(fixtures.TestWithFixtures):
                                     line_buffering=False)
             with mock.patch.object(ap, '_pager_env') as get_env:
                 stream = ap._paged_stream()
-                self.popen.assert_called_once_with(
-                    cmd.return_value,
-                    env=get_env.return_value,
-                    bufsize=-1,
-                    universal_newlines=True,
-                    encoding='UTF-8',
-                    errors='strict',
-                    stdin=subprocess.PIPE,
-                    stdout=None)
-                self.assertIs(stream, self.popen.return_value.stdin)
+                self._assert_default_pager(stream,
+                                           cmd.return_value,
+                                           get_env.return_value)
 
     def test_defaults_cmd_as_string(self) -> None:
         ap = autopage.AutoPager(pager_command='foo bar',
                                 line_buffering=False)
         with mock.patch.object(ap, '_pager_env') as get_env:
             stream = ap._paged_stream()
-            self.popen.assert_called_once_with(
-                ['foo', 'bar'],
-                env=get_env.return_value,
-                bufsize=-1,
-                universal_newlines=True,
-                encoding='UTF-8',
-                errors='strict',
-                stdin=subprocess.PIPE,
-                stdout=None)
-            self.assertIs(stream, self.popen.return_value.stdin)
+            self._assert_default_pager(stream,
+                                       ['foo', 'bar'], get_env.return_value)
 
     def test_defaults_cmd_as_int(self) -> None:
         self.assertRaises(TypeError, autopage.AutoPager,
@@ -168,6 +159,21 @@ class PagedStreamTest(fixtures.TestWithFixtures):
             self.assertIs(stream, self.popen.return_value.stdin)
 
 
+@contextlib.contextmanager
+def _patched_output(ap: autopage.AutoPager,
+                    to_terminal: bool,
+                    **paged_stream_kwargs: Any) -> Iterator[Tuple[mock.Mock,
+                                                                  mock.Mock]]:
+    with mock.patch.multiple(ap,
+                             to_terminal=mock.DEFAULT,
+                             _paged_stream=mock.DEFAULT,
+                             _reconfigure_output_stream=mock.DEFAULT) as mocks:
+        mocks['to_terminal'].return_value = to_terminal
+        page = mocks['_paged_stream']
+        page.configure_mock(**paged_stream_kwargs)
+        yield page, mocks['_reconfigure_output_stream']
+
+
 class ToTerminalTest(unittest.TestCase):
     def test_pty(self) -> None:
         with sinks.TTYFixture() as out:
@@ -198,9 +204,7 @@ class ToTerminalTest(unittest.TestCase):
 
     def test_launch_pager(self) -> None:
         ap = autopage.AutoPager()
-        with mock.patch.object(ap, 'to_terminal', return_value=True), \
-                mock.patch.object(ap, '_paged_stream') as page, \
-                mock.patch.object(ap, '_reconfigure_output_stream') as reconf:
+        with _patched_output(ap, to_terminal=True) as (page, reconf):
             with ap as stream:
                 page.assert_called_once()
                 self.assertIs(page.return_value, stream)
@@ -209,10 +213,8 @@ class ToTerminalTest(unittest.TestCase):
     def test_launch_pager_fail(self) -> None:
         outstream = mock.Mock()
         ap = autopage.AutoPager(outstream)
-        with mock.patch.object(ap, 'to_terminal', return_value=True), \
-                mock.patch.object(ap, '_paged_stream',
-                                  side_effect=OSError) as page, \
-                mock.patch.object(ap, '_reconfigure_output_stream') as reconf:
+        with _patched_output(ap, to_terminal=True,
+                             side_effect=OSError) as (page, reconf):
             with ap as stream:
                 page.assert_called_once()
                 reconf.assert_called_once()
@@ -221,9 +223,7 @@ class ToTerminalTest(unittest.TestCase):
     def test_no_pager(self) -> None:
         outstream = mock.Mock()
         ap = autopage.AutoPager(outstream)
-        with mock.patch.object(ap, 'to_terminal', return_value=False), \
-                mock.patch.object(ap, '_paged_stream') as page, \
-                mock.patch.object(ap, '_reconfigure_output_stream') as reconf:
+        with _patched_output(ap, to_terminal=False) as (page, reconf):
             with ap as stream:
                 page.assert_not_called()
                 self.assertIs(outstream, stream)
@@ -233,9 +233,7 @@ class ToTerminalTest(unittest.TestCase):
         outstream = mock.Mock()
         cat = command.CustomPager('cat')
         ap = autopage.AutoPager(outstream, pager_command=cat)
-        with mock.patch.object(ap, 'to_terminal', return_value=True), \
-                mock.patch.object(ap, '_paged_stream') as page, \
-                mock.patch.object(ap, '_reconfigure_output_stream') as reconf:
+        with _patched_output(ap, to_terminal=True) as (page, reconf):
             with ap as stream:
                 page.assert_not_called()
                 self.assertIs(outstream, stream)
@@ -281,38 +279,30 @@ class ExitCodeTest(fixtures.TestWithFixtures):
         class MyException(Exception):
             pass
 
-        def run() -> None:
+        with self.assertRaises(MyException):
             with self.ap:
                 raise MyException
-
-        self.assertRaises(MyException, run)
         self.assertEqual(1, self.ap.exit_code())
 
     def test_base_exception(self) -> None:
         class MyBaseException(BaseException):
             pass
 
-        def run() -> None:
+        with self.assertRaises(MyBaseException):
             with self.ap:
                 raise MyBaseException
-
-        self.assertRaises(MyBaseException, run)
         self.assertEqual(1, self.ap.exit_code())
 
     def test_interrupt(self) -> None:
-        def run() -> None:
+        with self.assertRaises(KeyboardInterrupt):
             with self.ap:
                 raise KeyboardInterrupt
-
-        self.assertRaises(KeyboardInterrupt, run)
         self.assertEqual(130, self.ap.exit_code())
 
     def test_system_exit(self) -> None:
-        def run() -> None:
+        with self.assertRaises(SystemExit):
             with self.ap:
                 raise SystemExit(42)
-
-        self.assertRaises(SystemExit, run)
         self.assertEqual(42, self.ap.exit_code())
 
 
@@ -355,54 +345,45 @@ class CleanupTest(unittest.TestCase):
                 stream.flush = flush  # type: ignore
             self.assertTrue(out.stream.closed)
 
-    def test_pager_stream_not_closed(self) -> None:
-        with sinks.TTYFixture() as out:
-            ap = autopage.AutoPager(out.stream)
-            with fixtures.MockPatch('subprocess.Popen') as popen:
-                with sinks.BufferFixture() as pager_in:
-                    popen.mock.return_value.stdin = pager_in.stream
-                    with ap as stream:
-                        self.assertIs(pager_in.stream, stream)
-                    self.assertTrue(pager_in.stream.closed)
 
-    def test_pager_stream_not_closed_interrupt(self) -> None:
-        with sinks.TTYFixture() as out:
-            ap = autopage.AutoPager(out.stream)
-            with fixtures.MockPatch('subprocess.Popen') as popen:
-                with sinks.BufferFixture() as pager_in:
-                    popen.mock.return_value.stdin = pager_in.stream
+class PagerCleanupTest(fixtures.TestWithFixtures):
+    def setUp(self) -> None:
+        out = sinks.TTYFixture()
+        self.useFixture(out)
+        popen = fixtures.MockPatch('subprocess.Popen')
+        self.useFixture(popen)
+        self.popen = popen.mock
+        pager_in = sinks.BufferFixture()
+        self.useFixture(pager_in)
+        self.pager_in = pager_in.stream
+        self.popen.return_value.stdin = self.pager_in
+        self.ap = autopage.AutoPager(out.stream)
 
-                    def run() -> None:
-                        with ap as stream:
-                            self.assertIs(pager_in.stream, stream)
-                            raise KeyboardInterrupt
+    def test_pager_stream_not_closed(self) -> None:
+        with self.ap as stream:
+            self.assertIs(self.pager_in, stream)
+        self.assertTrue(self.pager_in.closed)
 
-                    self.assertRaises(KeyboardInterrupt, run)
-                    self.assertTrue(pager_in.stream.closed)
+    def test_pager_stream_not_closed_interrupt(self) -> None:
+        with self.assertRaises(KeyboardInterrupt):
+            with self.ap as stream:
+                self.assertIs(self.pager_in, stream)
+                raise KeyboardInterrupt
+        self.assertTrue(self.pager_in.closed)
 
     def test_pager_broken_pipe(self) -> None:
         flush = mock.MagicMock(side_effect=BrokenPipeError)
-        with sinks.TTYFixture() as out:
-            ap = autopage.AutoPager(out.stream)
-            with fixtures.MockPatch('subprocess.Popen') as popen:
-                with sinks.BufferFixture() as pager_in:
-                    popen.mock.return_value.stdin = pager_in.stream
-                    pager_in.stream.flush = flush
-                    with ap as stream:
-                        self.assertIs(pager_in.stream, stream)
-                    self.assertTrue(pager_in.stream.closed)
-                    popen.mock.return_value.wait.assert_called_once()
+        self.pager_in.flush = flush  # type: ignore
+        with self.ap as stream:
+            self.assertIs(self.pager_in, stream)
+        self.assertTrue(self.pager_in.closed)
+        self.popen.return_value.wait.assert_called_once()
 
     def test_pager_stream_closed(self) -> None:
-        with sinks.TTYFixture() as out:
-            ap = autopage.AutoPager(out.stream)
-            with fixtures.MockPatch('subprocess.Popen') as popen:
-                with sinks.BufferFixture() as pager_in:
-                    popen.mock.return_value.stdin = pager_in.stream
-                    with ap as stream:
-                        self.assertIs(pager_in.stream, stream)
-                        stream.close()
-                    popen.mock.return_value.wait.assert_called_once()
+        with self.ap as stream:
+            self.assertIs(self.pager_in, stream)
+            stream.close()
+        self.popen.return_value.wait.assert_called_once()
 
 
 class StreamConfigureTest(fixtures.TestWithFixtures):
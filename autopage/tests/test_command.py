@@ -287,10 +287,18 @@ class GetPagerCommandTest(unittest.TestCase):
 
     def test_list(self) -> None:
         with fixtures.EnvironmentVariable('FOO', 'foo'):
-            cmd = command.get_pager_command(['FOO', 'BAR'])
+            with fixtures.EnvironmentVariable('BAR'):
+                cmd = command.get_pager_command(['FOO', 'BAR'])
         self.assertIsInstance(cmd, command.CustomPager)
         self.assertEqual(['foo'], cmd.command())
 
+    def test_tuple(self) -> None:
+        with fixtures.EnvironmentVariable('FOO'):
+            with fixtures.EnvironmentVariable('BAR', 'bar'):
+                cmd = command.get_pager_command(('FOO', 'BAR'))
+        self.assertIsInstance(cmd, command.CustomPager)
+        self.assertEqual(['bar'], cmd.command())
+
     def test_int(self) -> None:
         self.assertRaises(TypeError, command.get_pager_command, 42)
 
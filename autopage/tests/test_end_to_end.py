@@ -11,6 +11,7 @@
 #   under the License.
 
 import itertools
+import subprocess
 import unittest
 import sys
 
@@ -85,6 +86,11 @@ def with_stderr_output() -> int:
     return ap.exit_code()
 
 
+def subprocess_stderr_is_tty() -> int:
+    return subprocess.call([sys.executable, '-c',
+                            'import os, sys; sys.exit(not os.isatty(2))'])
+
+
 class InvokePagerTest(unittest.TestCase):
     def test_page_to_end(self) -> None:
         num_lines = 100
@@ -260,7 +266,7 @@ class NoPagerTest(unittest.TestCase):
             with env.stdout_pipe() as out:
                 output = out.readlines()
 
-            self.assertEqual(num_lines, len(output))
+            self.assertEqual([f'{i}\n' for i in range(num_lines)], output)
             self.assertFalse(env.error_output())
         self.assertEqual(0, env.exit_code())
 
@@ -276,21 +282,24 @@ class NoPagerTest(unittest.TestCase):
         num_lines = 10
         with isolation.isolate(from_stdin,
                                stdin_pipe=True, stdout_pipe=True) as env:
+            with env.stdout_pipe():
+                # Close output before the input arrives, so that the test
+                # process cannot have written it all before we do
+                pass
             with env.stdin_pipe() as in_pipe:
                 for i in range(num_lines):
                     print(i, file=in_pipe)
-            with env.stdout_pipe():
-                # Close output without reading contents of buffer
-                pass
             self.assertFalse(env.error_output())
         self.assertEqual(141, env.exit_code())
 
     def test_interrupt_early(self) -> None:
         with isolation.isolate(infinite, stdout_pipe=True) as env:
-            env.interrupt()
             with env.stdout_pipe() as out:
-                output = out.readlines()
-            self.assertGreater(len(output), 0)
+                # Wait for output to start before interrupting
+                output = [out.readline()]
+                env.interrupt()
+                output.extend(out.readlines())
+            self.assertGreater(len(output), 1)
             self.assertFalse(env.error_output())
         self.assertEqual(130, env.exit_code())
 
@@ -310,3 +319,10 @@ class NoPagerTest(unittest.TestCase):
 
             self.assertFalse(env.error_output())
         self.assertEqual(0, env.exit_code())
+
+
+class IsolationTest(unittest.TestCase):
+    def test_subprocess_inherits_tty(self) -> None:
+        with isolation.isolate(subprocess_stderr_is_tty) as env:
+            self.assertFalse(env.error_output())
+        self.assertEqual(0, env.exit_code())
@@ -24,21 +24,21 @@ _PagerConfig = command.PagerConfig
 
 
 class ConfigTest(unittest.TestCase):
-    def setUp(self) -> None:
-        class TestCommand(command.PagerCommand):
-            def __init__(self) -> None:
-                self.config: Optional[_PagerConfig] = None
+    class TestCommand(command.PagerCommand):
+        def __init__(self) -> None:
+            self.config: Optional[_PagerConfig] = None
 
-            def command(self) -> List[str]:
-                return []
+        def command(self) -> List[str]:
+            return []
 
-            def environment_variables(
-                    self,
-                    config: _PagerConfig) -> Optional[Dict[str, str]]:
-                self.config = config
-                return None
+        def environment_variables(
+                self,
+                config: _PagerConfig) -> Optional[Dict[str, str]]:
+            self.config = config
+            return None
 
-        self.test_command = TestCommand()
+    def setUp(self) -> None:
+        self.test_command = self.TestCommand()
 
     def _get_ap_config(self, **args: Any) -> command.PagerConfig:
         ap = autopage.AutoPager(pager_command=self.test_command, **args)